@@ -6,11 +6,22 @@ Full video understanding with complete ethological research framework
 from fastapi import FastAPI, UploadFile, File, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
 import tempfile
+import hashlib
+import logging
+import asyncio
 import os
-import shutil
+from typing import List, Optional, Tuple
 
-from .services.gemini_service import analyze_video
+from .services.gemini_service import analyze_video, submit_video_batch, get_batch_analysis
+from .services.key_pool import load_key_pool
+
+logging.basicConfig(
+    level=os.environ.get("ETHO_LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(message)s"
+)
+logger = logging.getLogger("etho")
 
 app = FastAPI(
     title="Etho API",
@@ -18,6 +29,63 @@ app = FastAPI(
     version="13.0.0"
 )
 
+# Max upload size for Gemini, plus slack for multipart boundaries/headers
+# when judging the whole request body by its Content-Length
+MAX_UPLOAD_BYTES = 100 * 1024 * 1024  # 100MB
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Video formats accepted for upload
+ALLOWED_VIDEO_TYPES = frozenset({
+    "video/mp4",
+    "video/quicktime",
+    "video/x-msvideo",
+    "video/webm",
+    "video/x-matroska",
+})
+
+# Bytes read from the upload per iteration
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+# Temp files are created once at startup and recycled (truncated) between
+# requests rather than created and unlinked per upload. A file is held for
+# the whole analysis, so when all are in use a request gets a one-off temp
+# file instead of waiting - the pool size is not a concurrency limit.
+TEMP_POOL_SIZE = int(os.environ.get("ETHO_TEMP_POOL_SIZE", "8"))
+_temp_pool: Optional["asyncio.Queue[Tuple[int, str]]"] = None
+_temp_files: List[Tuple[int, str]] = []
+
+_key_pool_task: Optional[asyncio.Task] = None
+
+
+class RejectOversizeUploads:
+    """
+    Reject uploads whose declared Content-Length is already over the cap,
+    before the multipart body is received and spooled. Plain ASGI, so other
+    routes pass straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == "/api/video/upload":
+            try:
+                content_length = int(Headers(scope=scope).get("content-length", 0))
+            except ValueError:
+                content_length = 0
+            if content_length > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+                response = JSONResponse(
+                    status_code=400,
+                    content={"detail": "Video too large. Maximum size is 100MB."}
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+# Added first so it runs inside CORS and its 400s carry the CORS headers
+app.add_middleware(RejectOversizeUploads)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +96,46 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def create_temp_pool():
+    """Pre-create and open the recycled upload temp files"""
+    global _temp_pool
+    _temp_pool = asyncio.Queue()
+    for _ in range(TEMP_POOL_SIZE):
+        temp_file = tempfile.mkstemp(suffix=".mp4")
+        _temp_files.append(temp_file)
+        _temp_pool.put_nowait(temp_file)
+
+
+async def _preload_key_pool():
+    try:
+        await load_key_pool()
+    except Exception as e:
+        logger.warning("  ⚠ Gemini key pool not loaded at startup: %s", e)
+
+
+@app.on_event("startup")
+async def create_key_pool():
+    """
+    Import the Gemini SDK and build the key pool in a worker thread, in the
+    background, so neither startup nor the first request blocks on it.
+    """
+    global _key_pool_task
+    _key_pool_task = asyncio.create_task(_preload_key_pool())
+
+
+@app.on_event("shutdown")
+async def remove_temp_pool():
+    """Close and delete the recycled upload temp files"""
+    for fd, path in _temp_files:
+        try:
+            os.close(fd)
+            os.unlink(path)
+        except OSError:
+            pass
+    _temp_files.clear()
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -50,10 +158,11 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
-    gemini_key = os.environ.get("GEMINI_API_KEY")
+    gemini_keys = os.environ.get("GEMINI_API_KEYS") or os.environ.get("GEMINI_API_KEY")
     return {
         "status": "healthy",
-        "gemini_configured": bool(gemini_key),
+        "gemini_configured": bool(gemini_keys),
+        "gemini_key_count": len([k for k in (gemini_keys or "").split(",") if k.strip()]),
         "version": "13.0.0"
     }
 
@@ -62,7 +171,8 @@ async def health_check():
 async def upload_and_analyze(
     file: UploadFile = File(...),
     mode: str = Query(default="full", description="Analysis mode: full or quick"),
-    use_cache: bool = Query(default=True, description="Use cached results if available")
+    use_cache: bool = Query(default=True, description="Use cached results if available"),
+    batch: bool = Query(default=False, description="Queue via Gemini Batch Mode (results within 24h, half cost)")
 ):
     """
     Upload a video and receive comprehensive ethological analysis.
@@ -72,50 +182,68 @@ async def upload_and_analyze(
     2. Uploads to Gemini File API
     3. Runs full ethological analysis with research frameworks
     4. Returns structured JSON with distress scoring, FACS codes, timeline
+    
+    With batch=true the analysis is queued instead and a job name is returned;
+    poll GET /api/video/batch/{job_name} for the result.
     """
     
-    # Validate file type
-    allowed_types = ["video/mp4", "video/quicktime", "video/x-msvideo", "video/webm", "video/x-matroska"]
+    # Validate file type (passed through to Gemini, so the extension is never parsed)
     content_type = file.content_type or "video/mp4"
     
-    if content_type not in allowed_types:
+    if content_type not in ALLOWED_VIDEO_TYPES:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid file type: {content_type}. Allowed: mp4, mov, avi, webm"
         )
     
-    # Check file size (max 100MB for Gemini)
-    file.file.seek(0, 2)  # Seek to end
-    file_size = file.file.tell()
-    file.file.seek(0)  # Seek back to start
+    logger.info("NEW ANALYSIS REQUEST")
+    logger.info("  File: %s", file.filename)
+    logger.info("  Type: %s", content_type)
+    logger.info("  Mode: %s", mode)
+    logger.info("  Batch: %s", batch)
     
-    if file_size > 100 * 1024 * 1024:  # 100MB
-        raise HTTPException(
-            status_code=400,
-            detail="Video too large. Maximum size is 100MB."
-        )
-    
-    print(f"\n{'='*60}")
-    print(f"NEW ANALYSIS REQUEST")
-    print(f"{'='*60}")
-    print(f"  File: {file.filename}")
-    print(f"  Size: {file_size / (1024*1024):.2f} MB")
-    print(f"  Type: {content_type}")
-    print(f"  Mode: {mode}")
-    
-    # Save to temp file
-    temp_path = None
+    # Stream to a pooled temp file, hashing as we go (single pass over the upload)
+    temp_file = None
+    pooled = True
     try:
-        # Create temp file with proper extension
-        ext = os.path.splitext(file.filename or "video.mp4")[1] or ".mp4"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as temp_file:
-            temp_path = temp_file.name
-            shutil.copyfileobj(file.file, temp_file)
+        try:
+            temp_file = _temp_pool.get_nowait()
+        except asyncio.QueueEmpty:
+            temp_file = tempfile.mkstemp(suffix=".mp4")
+            pooled = False
+        fd, temp_path = temp_file
+        digest = hashlib.sha256()
+        file_size = 0
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            # Enforce the size cap as we go, before writing the offending chunk
+            file_size += len(chunk)
+            if file_size > MAX_UPLOAD_BYTES:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Video too large. Maximum size is 100MB."
+                )
+            digest.update(chunk)
+            view = memoryview(chunk)
+            while view:
+                view = view[os.write(fd, view):]
+        content_hash = digest.hexdigest()
         
-        print(f"  Temp: {temp_path}")
+        logger.info("  Size: %.2f MB", file_size / (1024*1024))
+        logger.debug("  Temp: %s", temp_path)
+        logger.info("  SHA-256: %.12s", content_hash)
         
-        # Run analysis
-        result = analyze_video(temp_path, use_cache=use_cache)
+        if batch:
+            # Queue PASS 2 in Batch Mode (cache hits still return the full result)
+            result = await submit_video_batch(
+                temp_path, mime_type=content_type, use_cache=use_cache, content_hash=content_hash
+            )
+            if "job_name" in result:
+                return {"success": True, "batch": True, "data": result}
+        else:
+            # Run analysis (cache hits return before anything is sent to Gemini)
+            result = await analyze_video(
+                temp_path, mime_type=content_type, use_cache=use_cache, content_hash=content_hash
+            )
         
         # Check for errors
         if result.get("error"):
@@ -139,23 +267,56 @@ async def upload_and_analyze(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"  ERROR: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("  ERROR: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Analysis failed: {str(e)}"
         )
     finally:
-        # Clean up temp file
-        if temp_path and os.path.exists(temp_path):
+        # Empty the temp file and hand it back to the pool, or remove a one-off
+        if temp_file and pooled:
+            try:
+                os.ftruncate(temp_file[0], 0)
+                os.lseek(temp_file[0], 0, os.SEEK_SET)
+                logger.debug("  → Recycled temp file")
+            except OSError:
+                pass
+            _temp_pool.put_nowait(temp_file)
+        elif temp_file:
             try:
-                os.unlink(temp_path)
-                print(f"  → Cleaned up temp file")
-            except:
+                os.close(temp_file[0])
+                os.unlink(temp_file[1])
+                logger.debug("  → Cleaned up temp file")
+            except OSError:
                 pass
 
 
+@app.get("/api/video/batch/{job_name:path}")
+async def get_batch_job_result(job_name: str):
+    """
+    Poll a batch analysis submitted with POST /api/video/upload?batch=true.
+    Returns the job state while it is running, then the full analysis.
+    """
+    result = await get_batch_analysis(job_name)
+    
+    if result is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown batch job: {job_name}"
+        )
+    
+    if "job_name" in result:
+        return {"success": True, "batch": True, "data": result}
+    
+    if result.get("error") and result.get("error_type") != "no_pet_detected":
+        raise HTTPException(
+            status_code=500,
+            detail=result.get("message", "Analysis failed")
+        )
+    
+    return {"success": True, "data": result}
+
+
 @app.get("/api/models")
 async def list_models():
     """List available analysis models"""
@@ -182,9 +343,8 @@ async def list_models():
 # Error handlers
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
-    print(f"Unhandled exception: {exc}")
-    import traceback
-    traceback.print_exc()
+    # Pass the exception explicitly - handlers may run outside its except block
+    logger.exception("Unhandled exception: %s", exc, exc_info=exc)
     return JSONResponse(
         status_code=500,
         content={
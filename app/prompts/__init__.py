@@ -1,2 +1,2 @@
 """Etho Prompts"""
-from .ethological_prompt import ETHOLOGICAL_SYSTEM_PROMPT
+from .ethological_prompt import ETHOLOGICAL_SYSTEM_PROMPT, PROMPT_VERSION
@@ -12,6 +12,11 @@ Integrates research from:
 - Umwelt Theory (von Uexküll, 1934)
 """
 
+# Human-readable prompt version. Cached analyses are keyed on a hash of the
+# prompt texts and generation configs (gemini_service.ANALYSIS_VERSION), so
+# edits invalidate them whether or not this is bumped.
+PROMPT_VERSION = "5.0"
+
 ETHOLOGICAL_SYSTEM_PROMPT = """
 # ETHOLOGICAL AI ARCHITECT v5.0 - DEEP CONTEXTUAL ANALYSIS
 
@@ -1,2 +1,2 @@
 """Etho Services"""
-from .gemini_service import analyze_video
+from .gemini_service import analyze_video, submit_video_batch, get_batch_analysis
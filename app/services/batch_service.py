@@ -0,0 +1,108 @@
+"""
+Gemini Batch Mode for Etho
+Non-interactive analyses are submitted as batch jobs: results arrive
+within 24h at half the cost of a synchronous generate_content call.
+"""
+
+import os
+import json
+import logging
+import tempfile
+from typing import Optional, Tuple
+
+from ..prompts.ethological_prompt import ETHOLOGICAL_SYSTEM_PROMPT
+
+logger = logging.getLogger("etho")
+
+MODEL_NAME = "gemini-2.0-flash"
+
+# Terminal states for which no result will ever be produced
+FAILED_STATES = {"JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+
+def submit_batch_analysis(client, video_file, prompt: str, key: str, generation_config: dict) -> Tuple[str, str]:
+    """
+    Submit a single PASS 2 request as a batch job.
+    The video must already be uploaded to the Gemini File API with the same
+    client's key and stay there until the job finishes.
+
+    Returns:
+        (batch job name, used to poll for the result; uploaded request file
+        name, to delete once the result is collected)
+    """
+    request = {
+        "key": key,
+        "request": {
+            "system_instruction": {"parts": [{"text": ETHOLOGICAL_SYSTEM_PROMPT}]},
+            "contents": [{
+                "role": "user",
+                "parts": [
+                    {"file_data": {"file_uri": video_file.uri, "mime_type": video_file.mime_type}},
+                    {"text": prompt},
+                ],
+            }],
+            "generation_config": generation_config,
+        },
+    }
+
+    fd, jsonl_path = tempfile.mkstemp(suffix=".jsonl")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(json.dumps(request) + "\n")
+
+        logger.info("  → Uploading batch request...")
+        src_file = client.files.upload(
+            file=jsonl_path,
+            config={"display_name": f"etho-{key}", "mime_type": "jsonl"}
+        )
+    finally:
+        os.unlink(jsonl_path)
+
+    try:
+        batch_job = client.batches.create(
+            model=MODEL_NAME,
+            src=src_file.name,
+            config={"display_name": f"etho-{key}"}
+        )
+    except Exception:
+        # No job will ever read the request file
+        try:
+            client.files.delete(name=src_file.name)
+        except Exception:
+            pass
+        raise
+    logger.info("  ✓ Batch job submitted: %s", batch_job.name)
+    return batch_job.name, src_file.name
+
+
+def get_batch_result(client, job_name: str) -> Tuple[str, Optional[str]]:
+    """
+    Check a batch job.
+
+    Returns:
+        (state name, response text) - text is only set once the job succeeded
+
+    Raises:
+        ValueError: if the job finished without producing a response
+    """
+    batch_job = client.batches.get(name=job_name)
+    state = batch_job.state.name
+
+    if state in FAILED_STATES:
+        raise ValueError(f"Batch job {state}: {batch_job.error or 'no details'}")
+
+    if state != "JOB_STATE_SUCCEEDED":
+        return state, None
+
+    # Single-request jobs produce a single result line
+    content = client.files.download(file=batch_job.dest.file_name)
+    for line in content.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        if "error" in entry:
+            raise ValueError(f"Batch request failed: {entry['error']}")
+        parts = entry["response"]["candidates"][0]["content"]["parts"]
+        return state, "".join(part.get("text", "") for part in parts)
+
+    raise ValueError("Batch job succeeded but produced no results")
@@ -0,0 +1,175 @@
+"""
+Analysis Result Cache for Etho
+Two-tier store keyed by SHA-256 of the video bytes and the analysis version:
+1. Redis (if REDIS_URL is set) - shared across workers, 1h TTL
+2. Local gzip files otherwise - same TTL, judged by file mtime, with
+   expired files swept periodically so the directory stays bounded
+Also tracks submitted Gemini batch jobs until their results are collected.
+"""
+
+import os
+import time
+import gzip
+import logging
+import json
+import hashlib
+import tempfile
+from typing import Dict, Optional
+
+logger = logging.getLogger("etho")
+
+CACHE_DIR = os.environ.get("ETHO_CACHE_DIR", "/tmp/etho_cache")
+CACHE_TTL_SECONDS = 3600
+BATCH_TTL_SECONDS = 48 * 3600  # Batch jobs finish within 24h, uploaded files expire at 48h
+HASH_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+# Fail fast when Redis is unreachable rather than stalling every request
+REDIS_TIMEOUT_SECONDS = 0.5
+
+# How often each disk cache directory is swept for expired entries
+DISK_SWEEP_INTERVAL_SECONDS = 600
+
+_redis_client = None
+_last_sweep: Dict[str, float] = {}
+
+
+def hash_video_file(video_path: str) -> str:
+    """
+    SHA-256 of the video contents, streamed in 1 MiB chunks.
+    """
+    digest = hashlib.sha256()
+    with open(video_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _get_redis():
+    """Lazily connect to Redis. Returns None when not configured."""
+    global _redis_client
+    if _redis_client is None:
+        redis_url = os.environ.get("REDIS_URL")
+        if not redis_url:
+            return None
+        import redis
+        _redis_client = redis.Redis.from_url(
+            redis_url,
+            socket_connect_timeout=REDIS_TIMEOUT_SECONDS,
+            socket_timeout=REDIS_TIMEOUT_SECONDS
+        )
+    return _redis_client
+
+
+def _redis_key(content_hash: str, version: str) -> str:
+    return f"etho:analysis:{content_hash}:{version}"
+
+
+def _disk_path(content_hash: str, version: str) -> str:
+    return os.path.join(CACHE_DIR, f"{content_hash}-{version}.json.gz")
+
+
+def _batch_redis_key(job_name: str) -> str:
+    return f"etho:batch:{job_name}"
+
+
+def _batch_disk_path(job_name: str) -> str:
+    return os.path.join(CACHE_DIR, "batch", f"{job_name.replace('/', '_')}.json.gz")
+
+
+def _get_json(redis_key: str, disk_path: str, ttl: int) -> Optional[dict]:
+    """Read a gzipped JSON entry from Redis, or from disk when Redis isn't configured."""
+    client = _get_redis()
+    if client is not None:
+        try:
+            payload = client.get(redis_key)
+            if payload:
+                return json.loads(gzip.decompress(payload))
+        except Exception as e:
+            logger.warning("  ⚠ Redis cache read failed: %s", e)
+        return None
+
+    try:
+        if time.time() - os.path.getmtime(disk_path) > ttl:
+            os.unlink(disk_path)
+            return None
+        with gzip.open(disk_path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("  ⚠ Disk cache read failed: %s", e)
+        return None
+
+
+def _sweep_expired(directory: str, ttl: int) -> None:
+    """Remove expired entries from a disk cache directory, at most every few minutes."""
+    now = time.time()
+    if now - _last_sweep.get(directory, 0.0) < DISK_SWEEP_INTERVAL_SECONDS:
+        return
+    _last_sweep[directory] = now
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and now - entry.stat().st_mtime > ttl:
+                    os.unlink(entry.path)
+            except OSError:
+                pass
+
+
+def _set_json(redis_key: str, disk_path: str, value: dict, ttl: int) -> None:
+    """Write a gzipped JSON entry to Redis, or to disk. Failures are logged, never raised."""
+    payload = gzip.compress(json.dumps(value).encode("utf-8"))
+
+    client = _get_redis()
+    if client is not None:
+        try:
+            client.setex(redis_key, ttl, payload)
+        except Exception as e:
+            logger.warning("  ⚠ Redis cache write failed: %s", e)
+        return
+
+    try:
+        directory = os.path.dirname(disk_path)
+        os.makedirs(directory, exist_ok=True)
+        # Unique temp name so concurrent writers of the same entry can't clobber each other
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, disk_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        _sweep_expired(directory, ttl)
+    except Exception as e:
+        logger.warning("  ⚠ Disk cache write failed: %s", e)
+
+
+def get_cached_analysis(content_hash: str, version: str) -> Optional[dict]:
+    """
+    Look up a previous analysis for this video, made with this analysis
+    version (see gemini_service.ANALYSIS_VERSION).
+    """
+    return _get_json(_redis_key(content_hash, version), _disk_path(content_hash, version), CACHE_TTL_SECONDS)
+
+
+def set_cached_analysis(content_hash: str, version: str, result: dict) -> None:
+    """
+    Store a completed analysis.
+    """
+    _set_json(_redis_key(content_hash, version), _disk_path(content_hash, version), result, CACHE_TTL_SECONDS)
+
+
+def get_batch_job(job_name: str) -> Optional[dict]:
+    """
+    Look up what we recorded when a batch job was submitted.
+    """
+    return _get_json(_batch_redis_key(job_name), _batch_disk_path(job_name), BATCH_TTL_SECONDS)
+
+
+def set_batch_job(job_name: str, job_info: dict) -> None:
+    """
+    Record a submitted batch job (content hash, verified scene, uploaded file)
+    so the result can be enriched and cached once the job finishes.
+    """
+    _set_json(_batch_redis_key(job_name), _batch_disk_path(job_name), job_info, BATCH_TTL_SECONDS)
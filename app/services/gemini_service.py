@@ -6,73 +6,60 @@ TWO-PASS VERIFICATION SYSTEM to prevent hallucinations
 
 import os
 import json
-import time
+import hashlib
+import logging
 import re
-import google.generativeai as genai
-from ..prompts.ethological_prompt import ETHOLOGICAL_SYSTEM_PROMPT
+import asyncio
+import orjson
+import functools
+from typing import TYPE_CHECKING, Optional, Set, Tuple
+from tenacity import (
+    retry,
+    retry_if_exception,
+    wait_random_exponential,
+    stop_after_attempt,
+    before_sleep_log,
+)
+from ..prompts.ethological_prompt import ETHOLOGICAL_SYSTEM_PROMPT, PROMPT_VERSION
+from .cache_service import (
+    hash_video_file,
+    get_cached_analysis,
+    set_cached_analysis,
+    get_batch_job,
+    set_batch_job,
+)
+from .batch_service import submit_batch_analysis, get_batch_result
+from .key_pool import PooledKey, get_genai, get_key_pool, load_key_pool, with_key_rotation
 
-# Configure Gemini
-def get_gemini_client():
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY environment variable not set")
-    genai.configure(api_key=api_key)
-    return genai
+if TYPE_CHECKING:
+    from google.genai import types
 
+logger = logging.getLogger("etho")
 
-def upload_video_to_gemini(video_path: str):
-    """
-    Upload video to Gemini File API for processing.
-    Gemini can handle full video understanding natively.
-    """
-    print(f"  → Uploading video to Gemini...")
-    
-    # Determine mime type
-    ext = os.path.splitext(video_path)[1].lower()
-    mime_types = {
-        '.mp4': 'video/mp4',
-        '.mov': 'video/quicktime',
-        '.avi': 'video/x-msvideo',
-        '.webm': 'video/webm',
-        '.mkv': 'video/x-matroska',
-    }
-    mime_type = mime_types.get(ext, 'video/mp4')
-    
-    # Upload file
-    video_file = genai.upload_file(path=video_path, mime_type=mime_type)
-    print(f"  → Uploaded: {video_file.name}")
-    
-    # Wait for processing
-    print(f"  → Waiting for Gemini to process video...")
-    while video_file.state.name == "PROCESSING":
-        time.sleep(2)
-        video_file = genai.get_file(video_file.name)
-    
-    if video_file.state.name == "FAILED":
-        raise ValueError(f"Video processing failed: {video_file.state.name}")
-    
-    print(f"  ✓ Video ready for analysis")
-    return video_file
+MODEL_NAME = "gemini-2.0-flash"
 
+# Pass 1: very low temperature for factual accuracy
+SCENE_GENERATION_CONFIG = {
+    "temperature": 0.1,
+    "top_p": 0.95,
+    "max_output_tokens": 2048,
+    "response_mime_type": "application/json",
+}
 
-def run_scene_verification(video_file) -> dict:
-    """
-    PASS 1: Scene verification - What is ACTUALLY in this video?
-    This prevents hallucinations by establishing ground truth first.
-    """
-    print(f"  → Pass 1: Scene verification...")
-    
-    model = genai.GenerativeModel(
-        model_name="gemini-2.0-flash",
-        generation_config={
-            "temperature": 0.1,  # Very low for factual accuracy
-            "top_p": 0.95,
-            "max_output_tokens": 2048,
-            "response_mime_type": "application/json",
-        }
-    )
-    
-    scene_prompt = """
+# Pass 2: full ethological analysis. The schema usually fits in 2-3k
+# tokens; 4096 keeps headroom for long timelines (a truncated response is
+# unparseable JSON) while still capping runaway output.
+# top_k is left at the model default - it does little at this temperature.
+ANALYSIS_GENERATION_CONFIG = {
+    "temperature": 0.3,
+    "top_p": 0.95,
+    "max_output_tokens": 4096,
+    "response_mime_type": "application/json",
+}
+
+
+# PASS 1 prompt
+SCENE_PROMPT = """
 SCENE VERIFICATION - Answer ONLY what you can directly observe in this video.
 Do NOT infer, assume, or imagine anything that isn't clearly visible.
 
@@ -100,45 +87,175 @@ CRITICAL:
 - List ALL animals you can see, not just the main pet
 - Be extremely literal and factual
 """
-    
-    response = model.generate_content(
-        [video_file, scene_prompt],
-        request_options={"timeout": 120}
+
+
+@functools.lru_cache(maxsize=1)
+def _request_configs() -> Tuple["types.GenerateContentConfig", "types.GenerateContentConfig"]:
+    """
+    (scene, analysis) request configs, validated once on first use rather
+    than per call - and not at import, to keep the SDK off the cold start.
+    Timeouts are in ms.
+    """
+    types = get_genai().types
+    scene_config = types.GenerateContentConfig(
+        **SCENE_GENERATION_CONFIG,
+        http_options=types.HttpOptions(timeout=120_000)
+    )
+    analysis_config = types.GenerateContentConfig(
+        **ANALYSIS_GENERATION_CONFIG,
+        system_instruction=ETHOLOGICAL_SYSTEM_PROMPT,
+        http_options=types.HttpOptions(timeout=300_000)
+    )
+    return scene_config, analysis_config
+
+
+# JSON extraction fallbacks for responses that aren't pure JSON
+_CODE_BLOCK_RE = re.compile(r'```(?:json)?\s*([\s\S]*?)\s*```')
+_JSON_OBJ_RE = re.compile(r'\{[\s\S]*\}')
+
+# Fallback when the caller doesn't pass the upload's content type
+_MIME_BY_EXT = {
+    '.mp4': 'video/mp4',
+    '.mov': 'video/quicktime',
+    '.avi': 'video/x-msvideo',
+    '.webm': 'video/webm',
+    '.mkv': 'video/x-matroska',
+}
+
+# Word limits for interpret_lines fields
+MAX_PET_POV_WORDS = 10
+MAX_CONTEXT_TAG_WORDS = 5
+
+# Service unavailable / deadline exceeded. 429 is handled by key rotation,
+# unless there is only one key to rotate to.
+TRANSIENT_STATUS_CODES = {503, 504}
+
+# Fire-and-forget cleanup of uploaded files; strong refs keep tasks alive
+MAX_PENDING_DELETES = 32
+_pending_deletes: Set[asyncio.Task] = set()
+
+# File processing poll interval (seconds), doubled each check
+POLL_INITIAL_DELAY = 0.5
+POLL_MAX_DELAY = 4.0
+
+
+def _is_transient(error: BaseException) -> bool:
+    """
+    503 / 504 from the API - worth retrying with the same upload. A 429 is
+    only retried here when the pool has a single key; otherwise rotating to
+    a fresh key beats backing off on an exhausted one.
+    """
+    if not isinstance(error, get_genai().errors.APIError):
+        return False
+    if error.code == 429:
+        return len(get_key_pool()) == 1
+    return error.code in TRANSIENT_STATUS_CODES
+
+
+@retry(
+    retry=retry_if_exception(_is_transient),
+    wait=wait_random_exponential(multiplier=1, max=30),
+    stop=stop_after_attempt(4),
+    before_sleep=before_sleep_log(logger, logging.WARNING),
+    reraise=True
+)
+async def _generate_content(client, contents: list, config: "types.GenerateContentConfig"):
+    """
+    generate_content with jittered exponential backoff on transient errors.
+    Only this call is retried, so the uploaded video is reused across attempts.
+    With several keys a 429 propagates straight to the key rotation.
+    """
+    return await client.aio.models.generate_content(
+        model=MODEL_NAME,
+        contents=contents,
+        config=config
     )
+
+
+async def upload_video_to_gemini(client, video_path: str, mime_type: Optional[str] = None):
+    """
+    Upload video to Gemini File API for processing.
+    Gemini can handle full video understanding natively.
+    """
+    logger.info("  → Uploading video to Gemini...")
+    
+    # Determine mime type from the extension unless the caller knows it
+    if not mime_type:
+        mime_type = _MIME_BY_EXT.get(os.path.splitext(video_path)[1].lower(), 'video/mp4')
+    
+    # Upload file
+    video_file = await client.aio.files.upload(file=video_path, config={"mime_type": mime_type})
+    logger.info("  → Uploaded: %s", video_file.name)
+    
+    # Wait for processing - short clips are usually ready within a second,
+    # so start polling fast and back off for longer videos
+    logger.info("  → Waiting for Gemini to process video...")
+    delay = POLL_INITIAL_DELAY
+    while video_file.state.name == "PROCESSING":
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, POLL_MAX_DELAY)
+        video_file = await client.aio.files.get(name=video_file.name)
+    
+    if video_file.state.name == "FAILED":
+        raise ValueError(f"Video processing failed: {video_file.state.name}")
+    
+    logger.info("  ✓ Video ready for analysis")
+    return video_file
+
+
+async def delete_uploaded_file(client, name: str) -> None:
+    """Best-effort removal of an uploaded file (video or batch request) from the Gemini File API."""
+    try:
+        await client.aio.files.delete(name=name)
+        logger.debug("  → Cleaned up uploaded file")
+    except:
+        pass
+
+
+async def delete_uploaded_file_in_background(client, name: str) -> None:
+    """
+    Schedule deletion without making the caller wait for the round trip.
+    Uploaded files expire after 48h anyway, so this is best effort. If too
+    many deletes are already in flight, delete inline instead of piling up tasks.
+    """
+    if len(_pending_deletes) >= MAX_PENDING_DELETES:
+        await delete_uploaded_file(client, name)
+        return
+    task = asyncio.create_task(delete_uploaded_file(client, name))
+    _pending_deletes.add(task)
+    task.add_done_callback(_pending_deletes.discard)
+
+
+async def run_scene_verification(client, video_file) -> dict:
+    """
+    PASS 1: Scene verification - What is ACTUALLY in this video?
+    This prevents hallucinations by establishing ground truth first.
+    """
+    logger.info("  → Pass 1: Scene verification...")
+    
+    response = await _generate_content(client, [video_file, SCENE_PROMPT], _request_configs()[0])
     
     try:
-        scene_data = json.loads(response.text)
-        print(f"  ✓ Scene verified: {scene_data.get('scene_summary', 'No summary')[:80]}...")
+        scene_data = orjson.loads(response.text)
+        logger.info("  ✓ Scene verified: %.80s...", scene_data.get('scene_summary', 'No summary'))
         return scene_data
     except:
         # Try to extract JSON
-        json_match = re.search(r'\{[\s\S]*\}', response.text)
+        json_match = _JSON_OBJ_RE.search(response.text)
         if json_match:
             try:
-                return json.loads(json_match.group(0))
+                return orjson.loads(json_match.group(0))
             except:
                 pass
         return {"scene_summary": "Scene verification failed", "animals_visible": []}
 
 
-def analyze_video_with_context(video_file, scene_context: dict) -> str:
+def build_analysis_prompt(scene_context: dict) -> str:
     """
-    PASS 2: Full ethological analysis WITH scene context locked in.
-    The AI must analyze based on the verified scene, not hallucinated context.
+    Build the PASS 2 prompt with the verified scene context locked in.
+    Shared by the interactive and batch analysis paths; the
+    ETHOLOGICAL_SYSTEM_PROMPT is sent separately as the system instruction.
     """
-    print(f"  → Pass 2: Ethological analysis with verified context...")
-    
-    model = genai.GenerativeModel(
-        model_name="gemini-2.0-flash",
-        generation_config={
-            "temperature": 0.3,
-            "top_p": 0.95,
-            "top_k": 40,
-            "max_output_tokens": 8192,
-            "response_mime_type": "application/json",
-        }
-    )
-    
     # Build context string from scene verification
     animals = scene_context.get('animals_visible', [])
     other_animals = scene_context.get('other_animals_present', [])
@@ -174,8 +291,6 @@ CRITICAL INSTRUCTION: Your analysis MUST be consistent with the verified scene a
 """
     
     analysis_prompt = f"""
-{ETHOLOGICAL_SYSTEM_PROMPT}
-
 {context_str}
 
 Now analyze this pet video using the ethological research frameworks.
@@ -198,10 +313,33 @@ Pay close attention to:
 Return your analysis as valid JSON matching the expected schema.
 """
     
-    response = model.generate_content(
-        [video_file, analysis_prompt],
-        request_options={"timeout": 300}
-    )
+    return analysis_prompt
+
+
+# Cached analyses are keyed on everything that shapes the output: model,
+# prompts (the PASS 2 template rendered with an empty context) and
+# generation configs. Any edit to these invalidates old entries by itself.
+ANALYSIS_VERSION = hashlib.sha256(json.dumps([
+    MODEL_NAME,
+    PROMPT_VERSION,
+    ETHOLOGICAL_SYSTEM_PROMPT,
+    SCENE_PROMPT,
+    build_analysis_prompt({}),
+    SCENE_GENERATION_CONFIG,
+    ANALYSIS_GENERATION_CONFIG,
+], sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+async def analyze_video_with_context(client, video_file, scene_context: dict) -> str:
+    """
+    PASS 2: Full ethological analysis WITH scene context locked in.
+    The AI must analyze based on the verified scene, not hallucinated context.
+    """
+    logger.info("  → Pass 2: Ethological analysis with verified context...")
+    
+    analysis_prompt = build_analysis_prompt(scene_context)
+    
+    response = await _generate_content(client, [video_file, analysis_prompt], _request_configs()[1])
     
     return response.text
 
@@ -210,26 +348,28 @@ def parse_json_response(response_text: str) -> dict:
     """
     Parse JSON from Gemini response, handling potential formatting issues.
     """
-    # Try direct parse first
-    try:
-        return json.loads(response_text)
-    except json.JSONDecodeError:
-        pass
+    # Fast path: response_mime_type is JSON, so this is almost always a bare object
+    text = response_text.strip()
+    if text.startswith('{') and text.endswith('}'):
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
     
     # Try to extract JSON from markdown code blocks
-    json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', response_text)
+    json_match = _CODE_BLOCK_RE.search(text)
     if json_match:
         try:
-            return json.loads(json_match.group(1))
-        except json.JSONDecodeError:
+            return orjson.loads(json_match.group(1))
+        except orjson.JSONDecodeError:
             pass
     
     # Try to find JSON object in response
-    json_match = re.search(r'\{[\s\S]*\}', response_text)
+    json_match = _JSON_OBJ_RE.search(text)
     if json_match:
         try:
-            return json.loads(json_match.group(0))
-        except json.JSONDecodeError:
+            return orjson.loads(json_match.group(0))
+        except orjson.JSONDecodeError:
             pass
     
     # Return error structure
@@ -241,6 +381,17 @@ def parse_json_response(response_text: str) -> dict:
     }
 
 
+def _truncate_words(text: str, max_words: int) -> str:
+    """
+    Return text cut to max_words, or the original string if already short enough.
+    split(None, n) stops tokenizing after n splits, so long strings aren't fully split.
+    """
+    parts = text.split(None, max_words)
+    if len(parts) <= max_words:
+        return text
+    return " ".join(parts[:max_words])
+
+
 def validate_and_enrich_response(result: dict, scene_context: dict) -> dict:
     """
     Validate response structure and add any missing fields with defaults.
@@ -284,14 +435,12 @@ def validate_and_enrich_response(result: dict, scene_context: dict) -> dict:
         }
     }
     
-    # Merge defaults with result
+    # Merge defaults with result (result wins), then fill missing nested keys
+    result = {**defaults, **result}
     for key, default_value in defaults.items():
-        if key not in result:
-            result[key] = default_value
-        elif isinstance(default_value, dict) and isinstance(result.get(key), dict):
-            for subkey, subdefault in default_value.items():
-                if subkey not in result[key]:
-                    result[key][subkey] = subdefault
+        value = result[key]
+        if isinstance(default_value, dict) and isinstance(value, dict) and value is not default_value:
+            result[key] = {**default_value, **value}
     
     # Inject verified scene context
     result["_verified_scene"] = scene_context
@@ -331,115 +480,303 @@ def validate_and_enrich_response(result: dict, scene_context: dict) -> dict:
         result["overall_assessment"]["zone"] = "red"
         result["overall_assessment"]["zone_label"] = "ELEVATED"
     
-    # Ensure interpret_lines have proper format
-    if "interpret_lines" in result:
-        for line in result["interpret_lines"]:
-            # Handle both pet_pov and first_person_interpretation
-            text_field = line.get("pet_pov") or line.get("first_person_interpretation", "")
-            if text_field:
-                words = text_field.split()
-                if len(words) > 10:
-                    line["pet_pov"] = " ".join(words[:10])
-                    line["first_person_interpretation"] = " ".join(words[:10])
+    # Enforce the prompt's length limits on interpret_lines in one pass
+    for line in result.get("interpret_lines") or ():
+        pet_pov = line.get("pet_pov")
+        if pet_pov:
+            line["pet_pov"] = _truncate_words(pet_pov, MAX_PET_POV_WORDS)
+        tags = line.get("context_tags")
+        if isinstance(tags, list):
+            line["context_tags"] = [
+                _truncate_words(tag, MAX_CONTEXT_TAG_WORDS) if isinstance(tag, str) else tag
+                for tag in tags
+            ]
+        elif isinstance(tags, str):
+            line["context_tags"] = _truncate_words(tags, MAX_CONTEXT_TAG_WORDS)
     
     return result
 
 
-def analyze_video(video_path: str, use_cache: bool = True) -> dict:
+async def _finish_analysis(
+    response_text: str,
+    scene_context: dict,
+    content_hash: str,
+    analysis_version: str = ANALYSIS_VERSION
+) -> dict:
     """
-    Main entry point for video analysis.
-    Uses TWO-PASS VERIFICATION to prevent hallucinations:
-    1. Scene verification - establish ground truth
-    2. Ethological analysis - analyze with locked context
+    Parse a PASS 2 response, enrich it with the verified scene and cache it
+    under the analysis version that produced it.
+    """
+    result = parse_json_response(response_text)
     
-    Args:
-        video_path: Path to the video file
-        use_cache: Whether to use cached results (not implemented yet)
+    # Check for parse errors
+    if result.get("error") and result.get("error_type") == "parse_error":
+        logger.warning("  ⚠ Parse error, returning raw response")
+        return result
     
-    Returns:
-        Complete ethological analysis result
+    # Handle no pet detected
+    if result.get("pet_detected") == False:
+        result = {
+            "error": True,
+            "error_type": "no_pet_detected",
+            "message": result.get("message", "No pet detected in video"),
+            "_model_used": MODEL_NAME,
+            "_verified_scene": scene_context,
+            "_from_cache": False
+        }
+        await asyncio.to_thread(set_cached_analysis, content_hash, analysis_version, result)
+        return result
+    
+    # Validate and enrich with scene context
+    result = validate_and_enrich_response(result, scene_context)
+    
+    # Add metadata
+    result["_model_used"] = MODEL_NAME
+    result["_from_cache"] = False
+    result["_analysis_version"] = "etho-v15-verified"
+    
+    await asyncio.to_thread(set_cached_analysis, content_hash, analysis_version, result)
+    
+    logger.info("✓ Analysis complete!")
+    logger.info("  Species: %s", result.get('species', 'unknown'))
+    logger.info("  Breed: %s", result.get('breed_detected', 'unknown'))
+    logger.info("  Distress: %s", result.get('overall_assessment', {}).get('distress_score', 'N/A'))
+    logger.info("  Zone: %s", result.get('overall_assessment', {}).get('zone', 'N/A'))
+    if result.get('_interaction_type') == 'inter_species':
+        logger.info("  ⚠ Inter-species interaction detected!")
+    
+    return result
+
+
+@with_key_rotation(cost=2)
+async def _run_two_pass(key: PooledKey, video_path: str, mime_type: Optional[str]) -> Tuple[dict, str]:
     """
-    print("\n" + "="*60)
-    print("ETHO ANALYSIS - Two-Pass Verification System")
-    print("="*60)
+    Upload + both passes on a single key (uploaded files are per-project).
+    A 429 anywhere re-runs the whole pipeline on another key.
     
+    Returns:
+        (verified scene context, raw PASS 2 response text)
+    """
+    client = key.client
     video_file = None
     
     try:
-        # Initialize Gemini
-        get_gemini_client()
-        
         # Step 1: Upload video
-        print("\nStep 1/3: Uploading video to Gemini...")
-        video_file = upload_video_to_gemini(video_path)
+        logger.info("Step 1/3: Uploading video to Gemini (key %s)...", key.key_id)
+        video_file = await upload_video_to_gemini(client, video_path, mime_type)
         
         # Step 2: Scene verification (PASS 1)
-        print("\nStep 2/3: Verifying scene content...")
-        scene_context = run_scene_verification(video_file)
+        logger.info("Step 2/3: Verifying scene content...")
+        scene_context = await run_scene_verification(client, video_file)
         
         # Log what we found
-        print(f"  → Animals found: {scene_context.get('animals_visible', [])}")
-        print(f"  → Other animals: {scene_context.get('other_animals_present', [])}")
-        print(f"  → Setting: {scene_context.get('setting', 'unknown')}")
+        logger.info("  → Animals found: %s", scene_context.get('animals_visible', []))
+        logger.info("  → Other animals: %s", scene_context.get('other_animals_present', []))
+        logger.info("  → Setting: %s", scene_context.get('setting', 'unknown'))
         
         # Step 3: Run ethological analysis (PASS 2) with verified context
-        print("\nStep 3/3: Running ethological analysis with verified context...")
+        logger.info("Step 3/3: Running ethological analysis with verified context...")
+        response_text = await analyze_video_with_context(client, video_file, scene_context)
         
-        response_text = analyze_video_with_context(video_file, scene_context)
-        result = parse_json_response(response_text)
+        return scene_context, response_text
+    
+    finally:
+        # Clean up uploaded file (the result doesn't depend on it)
+        if video_file:
+            await delete_uploaded_file_in_background(client, video_file.name)
+
+
+async def analyze_video(
+    video_path: str,
+    mime_type: Optional[str] = None,
+    use_cache: bool = True,
+    content_hash: Optional[str] = None
+) -> dict:
+    """
+    Main entry point for video analysis.
+    Uses TWO-PASS VERIFICATION to prevent hallucinations:
+    1. Scene verification - establish ground truth
+    2. Ethological analysis - analyze with locked context
+    
+    Args:
+        video_path: Path to the video file
+        mime_type: Video MIME type (derived from the file extension if omitted)
+        use_cache: Whether to use cached results keyed by video content hash
+        content_hash: SHA-256 of the video if the caller already computed it
+    
+    Returns:
+        Complete ethological analysis result
+    """
+    logger.info("ETHO ANALYSIS - Two-Pass Verification System")
+    
+    try:
+        # Step 0: Check cache before paying for upload + analysis
+        if not content_hash:
+            content_hash = await asyncio.to_thread(hash_video_file, video_path)
+        if use_cache:
+            cached = await asyncio.to_thread(get_cached_analysis, content_hash, ANALYSIS_VERSION)
+            if cached is not None:
+                logger.info("  ✓ Cache hit: %.12s", content_hash)
+                cached["_from_cache"] = True
+                return cached
         
-        # Check for parse errors
-        if result.get("error") and result.get("error_type") == "parse_error":
-            print(f"  ⚠ Parse error, returning raw response")
-            return result
+        scene_context, response_text = await _run_two_pass(video_path, mime_type)
+        return await _finish_analysis(response_text, scene_context, content_hash)
         
-        # Handle no pet detected
-        if result.get("pet_detected") == False:
-            return {
-                "error": True,
-                "error_type": "no_pet_detected",
-                "message": result.get("message", "No pet detected in video"),
-                "_model_used": "gemini-2.0-flash",
-                "_verified_scene": scene_context,
-                "_from_cache": False
-            }
+    except Exception as e:
+        logger.exception("✗ Analysis failed: %s", e)
         
-        # Validate and enrich with scene context
-        result = validate_and_enrich_response(result, scene_context)
+        return {
+            "error": True,
+            "error_type": "analysis_failed",
+            "message": str(e),
+            "_model_used": MODEL_NAME,
+            "_from_cache": False
+        }
+
+
+@with_key_rotation(cost=2)
+async def _submit_two_pass_batch(
+    key: PooledKey,
+    video_path: str,
+    mime_type: Optional[str],
+    content_hash: str
+) -> str:
+    """
+    Upload + PASS 1 now, then queue PASS 2 as a batch job on the same key.
+    The key_id is recorded so the job is polled with the key that owns it.
+    
+    Returns:
+        The batch job name
+    """
+    client = key.client
+    video_file = None
+    
+    try:
+        logger.info("Step 1/3: Uploading video to Gemini (key %s)...", key.key_id)
+        video_file = await upload_video_to_gemini(client, video_path, mime_type)
         
-        # Add metadata
-        result["_model_used"] = "gemini-2.0-flash"
-        result["_from_cache"] = False
-        result["_analysis_version"] = "etho-v15-verified"
+        logger.info("Step 2/3: Verifying scene content...")
+        scene_context = await run_scene_verification(client, video_file)
         
-        print(f"\n✓ Analysis complete!")
-        print(f"  Species: {result.get('species', 'unknown')}")
-        print(f"  Breed: {result.get('breed_detected', 'unknown')}")
-        print(f"  Distress: {result.get('overall_assessment', {}).get('distress_score', 'N/A')}")
-        print(f"  Zone: {result.get('overall_assessment', {}).get('zone', 'N/A')}")
-        if result.get('_interaction_type') == 'inter_species':
-            print(f"  ⚠ Inter-species interaction detected!")
+        logger.info("Step 3/3: Submitting ethological analysis batch job...")
+        job_name, request_file_name = await asyncio.to_thread(
+            submit_batch_analysis,
+            client,
+            video_file,
+            build_analysis_prompt(scene_context),
+            content_hash,
+            ANALYSIS_GENERATION_CONFIG
+        )
+    except Exception:
+        # The batch job needs the uploaded file, so only clean up on failure
+        if video_file:
+            await delete_uploaded_file_in_background(client, video_file.name)
+        raise
+    
+    await asyncio.to_thread(set_batch_job, job_name, {
+        "content_hash": content_hash,
+        "analysis_version": ANALYSIS_VERSION,
+        "scene_context": scene_context,
+        "video_file_name": video_file.name,
+        "request_file_name": request_file_name,
+        "key_id": key.key_id,
+    })
+    
+    return job_name
+
+
+async def submit_video_batch(
+    video_path: str,
+    mime_type: Optional[str] = None,
+    use_cache: bool = True,
+    content_hash: Optional[str] = None
+) -> dict:
+    """
+    Batch entry point: verify the scene now, queue PASS 2 in Gemini Batch Mode.
+    PASS 1 is small and grounds the batch prompt; PASS 2 is the expensive
+    call and is the one that gets the batch discount.
+    
+    Args:
+        video_path: Path to the video file
+        mime_type: Video MIME type (derived from the file extension if omitted)
+        use_cache: Whether to return a cached result instead of queueing
+        content_hash: SHA-256 of the video if the caller already computed it
+    
+    Returns:
+        Batch job info ({"job_name", "state"}), a cached analysis, or an error structure
+    """
+    logger.info("ETHO ANALYSIS - Batch Mode")
+    
+    try:
+        if not content_hash:
+            content_hash = await asyncio.to_thread(hash_video_file, video_path)
+        if use_cache:
+            cached = await asyncio.to_thread(get_cached_analysis, content_hash, ANALYSIS_VERSION)
+            if cached is not None:
+                logger.info("  ✓ Cache hit: %.12s", content_hash)
+                cached["_from_cache"] = True
+                return cached
         
-        return result
+        job_name = await _submit_two_pass_batch(video_path, mime_type, content_hash)
+        return {"job_name": job_name, "state": "JOB_STATE_PENDING"}
         
     except Exception as e:
-        print(f"\n✗ Analysis failed: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("✗ Batch submission failed: %s", e)
         
+        return {
+            "error": True,
+            "error_type": "batch_submit_failed",
+            "message": str(e),
+            "_model_used": MODEL_NAME,
+            "_from_cache": False
+        }
+
+
+async def get_batch_analysis(job_name: str) -> Optional[dict]:
+    """
+    Poll a batch job submitted by submit_video_batch.
+    
+    Returns:
+        None if the job is unknown, batch job info while it is still running,
+        otherwise the same result structure as analyze_video
+    """
+    job_info = await asyncio.to_thread(get_batch_job, job_name)
+    if job_info is None:
+        return None
+    
+    content_hash = job_info["content_hash"]
+    # The result belongs to the prompts/configs the job was submitted with
+    analysis_version = job_info.get("analysis_version", ANALYSIS_VERSION)
+    
+    # Already collected by an earlier poll
+    cached = await asyncio.to_thread(get_cached_analysis, content_hash, analysis_version)
+    if cached is not None:
+        cached["_from_cache"] = True
+        return cached
+    
+    try:
+        key = (await load_key_pool()).get(job_info["key_id"])
+        if key is None:
+            raise ValueError("The API key that submitted this batch job is no longer configured")
+        state, response_text = await asyncio.to_thread(get_batch_result, key.client, job_name)
+    except Exception as e:
+        logger.error("  ✗ Batch job %s failed: %s", job_name, e)
         return {
             "error": True,
             "error_type": "analysis_failed",
             "message": str(e),
-            "_model_used": "gemini-2.0-flash",
+            "_model_used": MODEL_NAME,
             "_from_cache": False
         }
     
-    finally:
-        # Clean up uploaded file
-        if video_file:
-            try:
-                genai.delete_file(video_file.name)
-                print(f"  → Cleaned up uploaded file")
-            except:
-                pass
+    if response_text is None:
+        return {"job_name": job_name, "state": state}
+    
+    logger.info("  ✓ Batch job %s succeeded", job_name)
+    result = await _finish_analysis(response_text, job_info["scene_context"], content_hash, analysis_version)
+    await delete_uploaded_file_in_background(key.client, job_info["video_file_name"])
+    if job_info.get("request_file_name"):
+        await delete_uploaded_file_in_background(key.client, job_info["request_file_name"])
+    
+    return result
@@ -0,0 +1,217 @@
+"""
+Gemini API Key Pool for Etho
+A single key is a hard throughput ceiling, so requests are spread across
+every key in GEMINI_API_KEYS, picking the least loaded one. Keys that
+return 429 are cooled down for a minute and the work is retried on another
+key; with a single key the backoff happens around generate_content alone,
+so the uploaded video is reused.
+
+Uploaded files belong to the key's project, so a whole pipeline run
+(upload → both passes → delete) is pinned to one key.
+"""
+
+import os
+import time
+import logging
+import asyncio
+import hashlib
+import functools
+import threading
+from typing import List, Optional
+
+logger = logging.getLogger("etho")
+
+# google.genai pulls in pydantic models for the whole API surface (~0.4s),
+# so it is imported on first use instead of at app start
+_genai = None
+
+# Built on first use, off the event loop (see load_key_pool)
+_key_pool = None
+_key_pool_lock = threading.Lock()
+
+
+def _optional_limit(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+# Optional per-key quotas (requests per minute / per day). Unset means no
+# client-side limit - the API's own 429s are the only signal.
+RPM_LIMIT = _optional_limit("GEMINI_RPM_LIMIT")
+RPD_LIMIT = _optional_limit("GEMINI_RPD_LIMIT")
+
+COOLDOWN_SECONDS = 60
+MAX_BACKOFF_SECONDS = 30
+MAX_WAIT_SECONDS = 90  # Total time a call may wait for a key (covers one cooldown)
+MAX_RATE_LIMITED_ATTEMPTS = 5
+
+
+def get_genai():
+    """The google.genai module, imported once on first call."""
+    global _genai
+    if _genai is None:
+        from google import genai
+        _genai = genai
+    return _genai
+
+
+class PooledKey:
+    """One API key with its client and usage counters."""
+
+    __slots__ = ("key_id", "client", "rpm_used", "rpd_used", "minute_start", "day_start", "cooldown_until")
+
+    def __init__(self, api_key: str):
+        # Stable, non-secret identifier so jobs can be matched back to their key
+        self.key_id = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+        self.client = get_genai().Client(api_key=api_key)
+        now = time.monotonic()
+        self.rpm_used = 0
+        self.rpd_used = 0
+        self.minute_start = now
+        self.day_start = now
+        self.cooldown_until = 0.0
+
+    def remaining(self, now: float) -> float:
+        if now - self.minute_start >= 60:
+            self.minute_start, self.rpm_used = now, 0
+        if now - self.day_start >= 86400:
+            self.day_start, self.rpd_used = now, 0
+        # Unlimited keys rank by least used this minute
+        rpm_left = RPM_LIMIT - self.rpm_used if RPM_LIMIT is not None else float("inf")
+        rpd_left = RPD_LIMIT - self.rpd_used if RPD_LIMIT is not None else float("inf")
+        return min(rpm_left, rpd_left)
+
+    def available_in(self, now: float) -> float:
+        """Seconds until this key can be acquired again (cooldown or minute window)."""
+        wait = max(self.cooldown_until - now, 0.0)
+        if RPM_LIMIT is not None and self.rpm_used >= RPM_LIMIT:
+            wait = max(wait, self.minute_start + 60 - now)
+        return wait
+
+
+class KeyPool:
+    """Least-loaded selection over a fixed set of keys."""
+
+    def __init__(self, api_keys: List[str]):
+        self._keys = [PooledKey(api_key) for api_key in api_keys]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def acquire(self, cost: int = 1) -> Optional[PooledKey]:
+        """
+        Reserve `cost` requests on the key with the most remaining quota.
+        Returns None if every key is cooling down or out of quota.
+        """
+        now = time.monotonic()
+        with self._lock:
+            best, best_key = None, None
+            for key in self._keys:
+                if key.cooldown_until > now:
+                    continue
+                remaining = key.remaining(now)
+                if remaining < cost:
+                    continue
+                rank = (remaining, -key.rpm_used)
+                if best_key is None or rank > best_key:
+                    best, best_key = key, rank
+            if best is not None:
+                best.rpm_used += cost
+                best.rpd_used += cost
+            return best
+
+    def available_in(self) -> float:
+        """Seconds until any key can be acquired again."""
+        now = time.monotonic()
+        with self._lock:
+            return min(key.available_in(now) for key in self._keys)
+
+    def cool_down(self, key: PooledKey) -> None:
+        with self._lock:
+            key.cooldown_until = time.monotonic() + COOLDOWN_SECONDS
+
+    def get(self, key_id: str) -> Optional[PooledKey]:
+        """Find a key by key_id (e.g. to poll a batch job on the key that created it)."""
+        for key in self._keys:
+            if key.key_id == key_id:
+                return key
+        return None
+
+
+def get_key_pool() -> KeyPool:
+    """
+    The pool built from GEMINI_API_KEYS (comma-separated), falling back to
+    the single GEMINI_API_KEY. The first call imports the SDK and creates
+    the clients, so from async code use load_key_pool instead.
+    """
+    global _key_pool
+    if _key_pool is None:
+        with _key_pool_lock:
+            if _key_pool is None:
+                api_keys = [k.strip() for k in os.environ.get("GEMINI_API_KEYS", "").split(",") if k.strip()]
+                if not api_keys and os.environ.get("GEMINI_API_KEY"):
+                    api_keys = [os.environ["GEMINI_API_KEY"]]
+                if not api_keys:
+                    raise ValueError("GEMINI_API_KEYS or GEMINI_API_KEY environment variable not set")
+                _key_pool = KeyPool(api_keys)
+    return _key_pool
+
+
+async def load_key_pool() -> KeyPool:
+    """get_key_pool, building the pool in a worker thread if it doesn't exist yet."""
+    if _key_pool is not None:
+        return _key_pool
+    return await asyncio.to_thread(get_key_pool)
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return isinstance(error, get_genai().errors.APIError) and error.code == 429
+
+
+def with_key_rotation(cost: int = 1):
+    """
+    Decorator for coroutines taking a PooledKey as their first argument.
+    Acquires a key per attempt; on 429 the key is cooled down and the call
+    is retried on another one. When no key is available, wait (with
+    exponential backoff, bounded by MAX_WAIT_SECONDS) until one frees up.
+    A single-key pool is never cooled down - there is nothing to rotate
+    to - and its 429s are re-raised as-is: the in-place retry around
+    generate_content has already backed off on that key, and re-running
+    the whole call would only re-upload the video.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            pool = await load_key_pool()
+            deadline = time.monotonic() + MAX_WAIT_SECONDS
+            delay = 1.0
+            rate_limited = 0
+            last_error = None
+            while True:
+                key = pool.acquire(cost)
+                if key is None:
+                    # Sleep until a key frees up, but never past the deadline;
+                    # the loop always re-tries acquire() after sleeping
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        raise last_error or RuntimeError("No Gemini API key available")
+                    wait = min(max(pool.available_in(), delay), left)
+                    logger.warning("  ⚠ All Gemini keys busy, retrying in %.0fs", wait)
+                    await asyncio.sleep(wait)
+                    delay = min(delay * 2, MAX_BACKOFF_SECONDS)
+                    continue
+                try:
+                    return await func(key, *args, **kwargs)
+                except Exception as e:
+                    if not is_rate_limited(e):
+                        raise
+                    last_error = e
+                    rate_limited += 1
+                    left = deadline - time.monotonic()
+                    if len(pool) == 1 or rate_limited >= MAX_RATE_LIMITED_ATTEMPTS or left <= 0:
+                        raise
+                    logger.warning("  ⚠ Key %s rate limited, rotating", key.key_id)
+                    pool.cool_down(key)
+        return wrapper
+    return decorator